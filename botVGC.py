@@ -11,7 +11,11 @@ Bot de Pokémon Showdown para DOBLES aleatorias (Random Doubles estilo VGC)
 
 from __future__ import annotations
 import asyncio
+import heapq
+import json
 import os
+import threading
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
 from poke_env import AccountConfiguration, ShowdownServerConfiguration, ServerConfiguration
@@ -34,18 +38,30 @@ PS_LOGIN_URL = "https://play.pokemonshowdown.com/action.php?"
 VERBOSE = True
 DEBUG_DECISIONS = os.getenv("DEBUG_DECISIONS", "false").lower() == "true"
 
+# Memoria de series (Protect/speed control por rival) persistida entre reinicios
+SERIES_MEMORY_PATH = os.getenv("SERIES_MEMORY_PATH", "vgc_series_memory.json")
+_SERIES_MEMORY_LOCK = threading.Lock()
+
 SPREAD_DAMAGE_MOD = 0.75  # en dobles, los spreads hacen 0.75× daño
 
 
-def dbg(*a):
-    if DEBUG_DECISIONS:
+# Con DEBUG_DECISIONS desactivado dbg es un no-op; las llamadas con f-strings
+# se protegen además con `if DEBUG_DECISIONS:` para no formatear en balde.
+if DEBUG_DECISIONS:
+    def dbg(*a):
         try:
             print("[DBG]", *a)
         except Exception:
             pass
+else:
+    def dbg(*a):
+        pass
 
 EARLY_TURNS = 3
 
+# Multiplicador por stage de -6 a +6 (índice = stage + 6)
+_STAGE_MULT = tuple((2 + max(s, 0)) / (2 if s >= 0 else (2 - s)) for s in range(-6, 7))
+
 # Conjuntos de ids en minúsculas
 SETUP_IDS = {"swordsdance", "nastyplot", "calmmind", "quiverdance", "bulkup"}
 PROTECT_IDS = {"protect", "detect", "spikyshield", "kingsshield", "banefulbunker", "silktrap"}
@@ -71,6 +87,94 @@ AOE_FRIENDLY_FIRE = {
 # Singles dañinos que podrían usarse mal sobre el aliado con target "any/adjacentAlly" (en randoms, mejor evitar)
 HARMFUL_ALLY_SINGLES = {"beatup"}
 
+# Targets normalizados que golpean a varios (spread) y los que exigen elegir 1/2.
+# En dobles, 'any' o 'adjacentally/adjacentfoe' requieren 1/2 para pegar al rival correcto;
+# self/side/randomnormal no llevan objetivo.
+SPREAD_TARGETS = {"alladjacentfoes", "alladjacent", "all", "foes"}
+NEEDS_TARGET_SET = {"normal", "adjacentfoe", "adjacentally", "any"}
+# Targets con los que un single podría acabar golpeando al aliado
+ALLY_REACH_TARGETS = {"adjacentally", "ally", "any"}
+
+# AOE con fuego amigo agrupados por la inmunidad que protege al aliado
+GROUND_AOE_IDS = {"earthquake", "bulldoze"}
+SELF_KO_AOE_IDS = {"explosion", "selfdestruct"}
+WATER_AOE_IDS = {"surf", "water_spout"}
+FIRE_AOE_IDS = {"heatwave", "eruption"}
+ELECTRIC_IMMUNE_ABILITIES = {"voltabsorb", "lightningrod"}
+WATER_IMMUNE_ABILITIES = {"waterabsorb", "dryskin"}
+
+# Bits de categoría por id: una sola consulta a MOVE_TAGS sustituye a probar cada conjunto
+TAG_SETUP = 1 << 0
+TAG_PROTECT = 1 << 1
+TAG_SPEED_CTRL = 1 << 2
+TAG_REDIRECT = 1 << 3
+TAG_PIVOT = 1 << 4
+TAG_WIDE_GUARD = 1 << 5
+TAG_AOE_FF = 1 << 6
+TAG_HARMFUL_ALLY = 1 << 7
+TAG_SPREAD_HINT = 1 << 8
+
+
+def _build_move_tags() -> Dict[str, int]:
+    tags: Dict[str, int] = {}
+    for ids, bit in (
+        (SETUP_IDS, TAG_SETUP),
+        (PROTECT_IDS, TAG_PROTECT),
+        (SPEED_CTRL, TAG_SPEED_CTRL),
+        (REDIRECT_IDS, TAG_REDIRECT),
+        (PIVOT_IDS, TAG_PIVOT),
+        (WIDE_GUARD_IDS, TAG_WIDE_GUARD),
+        (AOE_FRIENDLY_FIRE, TAG_AOE_FF),
+        (HARMFUL_ALLY_SINGLES, TAG_HARMFUL_ALLY),
+        (SPREAD_HINTS, TAG_SPREAD_HINT),
+    ):
+        for mid in ids:
+            tags[mid] = tags.get(mid, 0) | bit
+    return tags
+
+
+MOVE_TAGS: Dict[str, int] = _build_move_tags()
+
+# Setup que sube ataque físico (el resto de SETUP_IDS sube ataque especial)
+PHYS_SETUP_IDS = {"swordsdance", "bulkup"}
+
+# Tabla de tipos por formato, compartida entre instancias del bot
+_TYPE_CHART_CACHE: Dict[str, dict] = {}
+
+
+def _get_type_chart(fmt: str) -> dict:
+    chart = _TYPE_CHART_CACHE.get(fmt)
+    if chart is None:
+        chart = _TYPE_CHART_CACHE.setdefault(fmt, GenData.from_format(fmt).type_chart)
+    return chart
+
+
+@dataclass(frozen=True, slots=True)
+class MoveInfo:
+    """Datos normalizados de un movimiento, calculados una vez por turno."""
+    mid: str       # id en minúsculas
+    bp: int        # base_power (0 si es de estado)
+    mtype: object  # PokemonType del movimiento (o None)
+    target: str    # target normalizado
+    category: str  # "physical" / "special" / "status"
+    tags: int      # bits TAG_* de MOVE_TAGS
+    spread: bool        # golpea a varios (no se elige objetivo)
+    needs_target: bool  # PS exige elegir 1/2
+
+
+@dataclass(frozen=True, slots=True)
+class MonState:
+    """Estado de un Pokémon activo relevante para puntuar, leído una vez por turno."""
+    atk_stage: int
+    spa_stage: int
+    spe_stage: int
+    status: str        # "brn" / "par" / ... ("" si no tiene)
+    types: frozenset   # tipos (para STAB)
+    type_names: frozenset  # nombres de tipo en minúsculas ("flying", ...)
+    ability: str       # en minúsculas
+    item: str          # en minúsculas
+    last_protect: bool  # su último movimiento fue un Protect
+
 
 class VGCHeuristicsRandom(Player):
     """Jugador heurístico para DOBLES aleatorias con trazas y adaptación en tiempo real."""
@@ -78,78 +182,109 @@ class VGCHeuristicsRandom(Player):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._typedata = None
-        self.series_memory: Dict[str, Dict[str, bool]] = {}
+        self._move_info: Dict[int, MoveInfo] = {}  # id(move) -> MoveInfo (por turno)
+        self._eff_cache: Dict[Tuple[object, int], float] = {}  # (tipo, id(defensor)) -> multiplicador (por turno)
+        self._mon_state: Dict[int, MonState] = {}  # id(mon) -> MonState (por turno)
+        self.series_memory: Dict[str, Dict[str, bool]] = self._load_series_memory()
         self._prefer_target_slot: Optional[int] = None  # 1/2 para doble focus
+        self._moves_for_slot_impl = None  # lector de available_moves según su forma (ver _moves_for_slot)
 
     # ---------- utilidades de tipos / normalización ----------
-    def _ensure_type_chart(self):
-        if self._typedata is None:
-            self._typedata = GenData.from_format(self.format).type_chart
-
     def _eff(self, atk_type, defender) -> float:
-        self._ensure_type_chart()
         if not atk_type or not defender:
             return 1.0
-        return atk_type.damage_multiplier(*defender.types, type_chart=self._typedata)
+        key = (atk_type, id(defender))
+        eff = self._eff_cache.get(key)
+        if eff is None:
+            tc = self._typedata
+            if tc is None:
+                tc = self._typedata = _get_type_chart(self.format)
+            eff = atk_type.damage_multiplier(*defender.types, type_chart=tc)
+            self._eff_cache[key] = eff
+        return eff
+
+    def _state(self, mon) -> MonState:
+        """MonState de `mon`, memoizado por id(mon) durante el turno."""
+        key = id(mon)
+        st = self._mon_state.get(key)
+        if st is None:
+            boosts = getattr(mon, "boosts", None) or {}
+            types = frozenset(t for t in (getattr(mon, "types", None) or ()) if t)
+            last = getattr(mon, "last_move", None)
+            st = MonState(
+                atk_stage=int(boosts.get("atk", 0)),
+                spa_stage=int(boosts.get("spa", 0)),
+                spe_stage=int(boosts.get("spe", 0)),
+                status=self._enum_name_lower(getattr(mon, "status", None)),
+                types=types,
+                type_names=frozenset(str(getattr(t, "name", t)).lower() for t in types),
+                ability=(getattr(mon, "ability", None) or "").lower(),
+                item=(getattr(mon, "item", None) or "").lower(),
+                last_protect=bool(last) and (str(getattr(last, "id", "") or "").lower() in PROTECT_IDS),
+            )
+            self._mon_state[key] = st
+        return st
 
     def _stab(self, move, attacker) -> float:
-        return 1.5 if move.type and attacker and move.type in attacker.types else 1.0
+        mtype = self._prep(move).mtype
+        return 1.5 if mtype and attacker and mtype in self._state(attacker).types else 1.0
 
     def _acc(self, move) -> float:
         return move.accuracy or 1.0
 
+    def _prep(self, move) -> MoveInfo:
+        """MoveInfo de `move`, memoizado por id(move) durante el turno."""
+        key = id(move)
+        mi = self._move_info.get(key)
+        if mi is not None:
+            return mi
+        mid = (getattr(move, "id", "") or "").lower()
+        t = self._enum_name_lower(getattr(move, "target", None))
+        tags = MOVE_TAGS.get(mid, 0)
+        spread = bool(tags & TAG_SPREAD_HINT) or (t in SPREAD_TARGETS)
+        mi = MoveInfo(
+            mid=mid,
+            bp=getattr(move, "base_power", 0) or 0,
+            mtype=getattr(move, "type", None),
+            target=t,
+            category=self._enum_name_lower(getattr(move, "category", None)),
+            tags=tags,
+            spread=spread,
+            needs_target=(not spread) and (t in NEEDS_TARGET_SET),
+        )
+        self._move_info[key] = mi
+        return mi
+
     @staticmethod
-    def _target_str(move) -> str:
-        """Normaliza move.target a str en minúsculas (maneja enum/objeto)."""
-        t = getattr(move, "target", None)
+    def _enum_name_lower(v) -> str:
+        """Nombre en minúsculas de un enum de poke-env (target, categoría, estado...) o de un str."""
         try:
-            if isinstance(t, str):
-                return t.lower()
-            name = getattr(t, "name", None)
+            if isinstance(v, str):
+                return v.lower()
+            name = getattr(v, "name", None)
             if name is not None:
                 return str(name).lower()
-            value = getattr(t, "value", None)
+            value = getattr(v, "value", None)
             if value is not None:
                 return str(value).lower()
-            return str(t).lower() if t is not None else ""
+            return str(v).lower() if v is not None else ""
         except Exception:
             return ""
 
-    def _is_spread(self, move) -> bool:
-        t = self._target_str(move)
-        mid = (getattr(move, "id", "") or "").lower()
-        return (mid in SPREAD_HINTS) or (t in {"alladjacentfoes", "alladjacent", "all", "foes"})
-
-    def _requires_explicit_target(self, move) -> bool:
-        """True si PS exige elegir 1/2; False para spreads/self/side/randomnormal."""
-        if self._is_spread(move):
-            return False
-        t = self._target_str(move)
-        if t in {"self", "ally", "allyteam", "allyside", "foeside", "allies", "randomnormal"}:
-            return False
-        # En dobles, 'any' o 'adjacentally/adjacentfoe' requieren 1/2 para pegar al rival correcto.
-        return t in {"normal", "adjacentfoe", "adjacentally", "any"}
-
-    @staticmethod
-    def _is_physical(move) -> bool:
-        return str(getattr(move, "category", "")).lower() == "physical"
-
-    @staticmethod
-    def _is_special(move) -> bool:
-        return str(getattr(move, "category", "")).lower() == "special"
-
     @staticmethod
     def _stage_mod(stage: int) -> float:
-        return (2 + max(stage, 0)) / (2 if stage >= 0 else (2 - stage))
+        return _STAGE_MULT[max(-6, min(6, stage)) + 6]
 
     def _atk_mult(self, me, move) -> float:
         mult = 1.0
-        if self._is_physical(move):
-            mult *= self._stage_mod(int(getattr(me, "boosts", {}).get("atk", 0)))
-            if getattr(me, "status", None) == "brn":
+        category = self._prep(move).category
+        if category == "physical":
+            st = self._state(me)
+            mult *= self._stage_mod(st.atk_stage)
+            if st.status == "brn":
                 mult *= 0.65
-        elif self._is_special(move):
-            mult *= self._stage_mod(int(getattr(me, "boosts", {}).get("spa", 0)))
+        elif category == "special":
+            mult *= self._stage_mod(self._state(me).spa_stage)
         return mult
 
     # ---------- helpers de dobles (slots) ----------
@@ -163,14 +298,41 @@ class VGCHeuristicsRandom(Player):
         return 0
 
     def _moves_for_slot(self, battle, slot: int) -> List:
-        # poke-env puede exponer available_moves como [lista, lista] o split por slot
+        # poke-env puede exponer available_moves como [lista, lista] o split por slot.
+        # La forma depende de la versión de poke-env: en cuanto es inequívoca (anidada o
+        # split) se fija el lector para la instancia; mientras parezca plana se sigue probando.
+        impl = self._moves_for_slot_impl
+        if impl is None:
+            impl = self._detect_moves_layout(battle)
+            if impl is None:
+                return getattr(battle, "available_moves", [])
+            self._moves_for_slot_impl = impl
+        return impl(battle, slot)
+
+    @classmethod
+    def _detect_moves_layout(cls, battle):
+        """Lector para la forma de available_moves, o None si aún no es inequívoca.
+
+        Una lista plana no se cachea: available_moves2 puede ser None en turnos con un
+        solo Pokémon activo, y fijar el lector plano daría a slot 1 los moves de slot 0.
+        """
         mv = getattr(battle, "available_moves", [])
         if mv and isinstance(mv[0], list):
-            return mv[slot] if slot < len(mv) else []
-        alt = getattr(battle, "available_moves2", None)
-        if alt is not None:
-            return mv if slot == 0 else alt
-        return mv
+            return cls._moves_nested
+        if getattr(battle, "available_moves2", None) is not None:
+            return cls._moves_split
+        return None
+
+    @staticmethod
+    def _moves_nested(battle, slot: int) -> List:
+        mv = getattr(battle, "available_moves", [])
+        return mv[slot] if slot < len(mv) else []
+
+    @staticmethod
+    def _moves_split(battle, slot: int) -> List:
+        if slot == 0:
+            return getattr(battle, "available_moves", [])
+        return getattr(battle, "available_moves2", None) or []
 
     # ---------- memoria simple de sets rivales (Protect/speed) ----------
     def _get_series_mem(self, battle) -> Dict[str, bool]:
@@ -179,69 +341,98 @@ class VGCHeuristicsRandom(Player):
             self.series_memory[opp] = {"protect": False, "speed_ctrl": False}
         return self.series_memory[opp]
 
-    def _update_series_mem_from_battle(self, battle):
+    @staticmethod
+    def _load_series_memory() -> Dict[str, Dict[str, bool]]:
+        try:
+            with open(SERIES_MEMORY_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        # Solo entradas bien formadas: un fichero corrupto no debe romper choose_move
+        return {
+            str(opp): {"protect": bool(mem.get("protect")), "speed_ctrl": bool(mem.get("speed_ctrl"))}
+            for opp, mem in data.items()
+            if isinstance(mem, dict)
+        }
+
+    def _save_series_memory(self):
+        # Escritura atómica (tmp + replace) y serializada entre hilos/instancias
+        with _SERIES_MEMORY_LOCK:
+            tmp = SERIES_MEMORY_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.series_memory, f)
+            os.replace(tmp, SERIES_MEMORY_PATH)
+
+    def _update_series_mem_from_battle(self, battle) -> bool:
+        """Aprende Protect/speed control de los sets rivales; True si la memoria cambió."""
         mem = self._get_series_mem(battle)
+        if mem.get("protect") and mem.get("speed_ctrl"):
+            return False  # ya no hay nada que aprender de este rival
+        changed = False
         for mon in (battle.opponent_team or {}).values():
             if not mon or not mon.moves:
                 continue
             ids = {(m.id or "").lower() for m in mon.moves.values()}
-            if ids & PROTECT_IDS:
+            if not mem.get("protect") and ids & PROTECT_IDS:
                 mem["protect"] = True
-            if ids & SPEED_CTRL:
+                changed = True
+            if not mem.get("speed_ctrl") and ids & SPEED_CTRL:
                 mem["speed_ctrl"] = True
+                changed = True
+            if mem.get("protect") and mem.get("speed_ctrl"):
+                break
+        return changed
 
     # ---------- ajustes de score ----------
     def _protect_risk_factor(self, target) -> float:
-        try:
-            last = getattr(target, "last_move", None)
-            if last and (getattr(last, "id", "").lower() in PROTECT_IDS):
-                return 0.6
-        except Exception:
-            pass
-        return 1.0
+        return 0.6 if self._state(target).last_protect else 1.0
 
     def _move_score_vs_single(self, move, me, target, mem: Dict[str, bool]) -> float:
         if not move:
             return 0.0
-        mid = (move.id or "").lower()
+        mi = self._prep(move)
+        mid = mi.mid
+        bp = mi.bp
+        tag = mi.tags
 
         # Evita pegar al aliado si el move permite "any/adjacentally" y es dañino.
-        t = self._target_str(move)
-        if (t in {"adjacentally", "ally", "any"}) and (move.base_power or 0) > 0:
-            if mid in HARMFUL_ALLY_SINGLES:
+        if (mi.target in ALLY_REACH_TARGETS) and bp > 0:
+            if tag & TAG_HARMFUL_ALLY:
                 return 0.0
 
         # Estado útil (pero preferimos atacar en randoms)
-        if not move.base_power or move.base_power == 0:
-            if any(k in mid for k in SETUP_IDS):
-                need = 0
-                if "swordsdance" in mid or "bulkup" in mid:
-                    need = -int(getattr(me, "boosts", {}).get("atk", 0))
-                elif any(k in mid for k in ("nastyplot", "calmmind", "quiverdance")):
-                    need = -int(getattr(me, "boosts", {}).get("spa", 0))
+        if bp == 0:
+            st = self._state(me)
+            if tag & TAG_SETUP:
+                if mid in PHYS_SETUP_IDS:
+                    need = -st.atk_stage
+                else:
+                    need = -st.spa_stage
                 return 26.0 + 1.5 * max(0, need)
-            if any(k in mid for k in SPEED_CTRL):
-                spe_penalty = int(getattr(me, "boosts", {}).get("spe", 0))
-                par_pen = 1 if getattr(me, "status", None) == "par" else 0
+            if tag & TAG_SPEED_CTRL:
+                spe_penalty = st.spe_stage
+                par_pen = 1 if st.status == "par" else 0
                 return 32.0 + 3.0 * max(0, -spe_penalty + par_pen)
-            if mid in REDIRECT_IDS:
+            if tag & TAG_REDIRECT:
                 return 28.0
-            if mid in PROTECT_IDS:
+            if tag & TAG_PROTECT:
                 return 28.0 + (3.0 if mem.get("protect") else 0.0)
-            if mid in WIDE_GUARD_IDS:
+            if tag & TAG_WIDE_GUARD:
                 return 27.0
-            if mid in PIVOT_IDS:
-                atk_drop = int(getattr(me, "boosts", {}).get("atk", 0))
-                spa_drop = int(getattr(me, "boosts", {}).get("spa", 0))
+            if tag & TAG_PIVOT:
+                atk_drop = st.atk_stage
+                spa_drop = st.spa_stage
                 drop_bonus = 3.0 if (atk_drop <= -2 or spa_drop <= -2) else 0.0
                 return 12.0 + drop_bonus
             return 4.0
 
         # Ataques: potencia efectiva por tipos/boosts/accuracy
-        eff = self._eff(move.type, target)
+        eff = self._eff(mi.mtype, target)
         if eff == 0:
             return 0.0
-        score = (move.base_power) * self._stab(move, me) * eff * self._acc(move) * self._atk_mult(me, move)
+        score = bp * self._stab(move, me) * eff * self._acc(move) * self._atk_mult(me, move)
         # Potencia un poco más si es súper eficaz x2 o x4
         if eff >= 4:
             score *= 1.20
@@ -256,17 +447,21 @@ class VGCHeuristicsRandom(Player):
         score *= self._protect_risk_factor(target)
         return float(score)
 
-    def _move_score_spread(self, move, me, opps, mem: Dict[str, bool], ally=None) -> float:
+    def _move_score_spread(self, move, me, live_opps, mem: Dict[str, bool], ally=None) -> float:
         if not move:
             return 0.0
-        mid = (move.id or "").lower()
+        mi = self._prep(move)
+        if not mi.bp:
+            return 0.0  # spreads de estado no suman daño
+        effs = [self._eff(mi.mtype, t) for t in live_opps]
+        if not any(effs):
+            return 0.0  # todos los rivales son inmunes
+        mid = mi.mid
         total = 0.0
-        live_opps = [o for o in opps if o and not o.fainted]
-        for t in live_opps:
-            eff = self._eff(move.type, t)
+        for t, eff in zip(live_opps, effs):
             if eff == 0:
                 continue
-            part = move.base_power * self._stab(move, me) * eff * self._acc(move) * self._atk_mult(me, move)
+            part = mi.bp * self._stab(move, me) * eff * self._acc(move) * self._atk_mult(me, move)
             if eff >= 4:
                 part *= 1.12
             elif eff >= 2:
@@ -276,8 +471,8 @@ class VGCHeuristicsRandom(Player):
             part *= self._protect_risk_factor(t)
             total += part
         # Fuego amigo: penaliza salvo que el aliado sea inmune/beneficiado
-        if mid in AOE_FRIENDLY_FIRE and ally is not None and len(live_opps) >= 1:
-            safe = self._ally_safe_for_aoe(mid, move.type, ally)
+        if (mi.tags & TAG_AOE_FF) and ally is not None and len(live_opps) >= 1:
+            safe = self._ally_safe_for_aoe(mid, mi.mtype, ally)
             if not safe:
                 total *= 0.20
         total = total * SPREAD_DAMAGE_MOD * 1.03
@@ -287,48 +482,50 @@ class VGCHeuristicsRandom(Player):
     def _ally_safe_for_aoe(self, move_id: str, move_type, ally) -> bool:
         if ally is None:
             return True
-        ability = (ally.ability or "").lower() if hasattr(ally, "ability") else ""
+        st = self._state(ally)
+        ability = st.ability
         if ability == "telepathy":
             return True
         mid = (move_id or "").lower()
-        types = {getattr(t, "name", str(t)) for t in (ally.types or [])}
-        item = (ally.item or "").lower() if hasattr(ally, "item") else ""
-        if mid in {"earthquake", "bulldoze"}:
-            return ("Flying" in types) or (ability in {"levitate"}) or (item == "airballoon")
-        if mid in {"explosion", "selfdestruct"}:
-            return ("Ghost" in types)
+        types = st.type_names
+        item = st.item
+        if mid in GROUND_AOE_IDS:
+            return ("flying" in types) or (ability == "levitate") or (item == "airballoon")
+        if mid in SELF_KO_AOE_IDS:
+            return ("ghost" in types)
         if mid == "discharge":
-            return ("Ground" in types) or (ability in {"voltabsorb", "lightningrod"})
-        if mid in {"surf", "water_spout"}:
-            return ability in {"waterabsorb", "dryskin"}
-        if mid in {"heatwave", "eruption"}:
-            return ability in {"flashfire"}
+            return ("ground" in types) or (ability in ELECTRIC_IMMUNE_ABILITIES)
+        if mid in WATER_AOE_IDS:
+            return ability in WATER_IMMUNE_ABILITIES
+        if mid in FIRE_AOE_IDS:
+            return ability == "flashfire"
         if mid == "sludgewave":
             return False
         return False
 
     # ---------- elección mejor movimiento y objetivo ----------
-    def _best_move_and_target(self, battle, me, opps, mem: Dict[str, bool], ally=None, prefer_slot: Optional[int]=None) -> Tuple[float, Optional[object], int, str]:
-        """(score, move, target_index_ps, reason). target_index_ps: 1/2; 0 para auto/spread."""
+    def _best_move_and_target(self, battle, me, live_opps, tmap, mem: Dict[str, bool], ally=None, prefer_slot: Optional[int]=None) -> Tuple[float, Optional[object], int, str]:
+        """(score, move, target_index_ps, reason). target_index_ps: 1/2; 0 para auto/spread.
+
+        `live_opps` y `tmap` ([(rival, 1/2)]) se calculan una vez por turno en choose_move.
+        """
         slot = self._slot_index(battle, me)
         my_moves = self._moves_for_slot(battle, slot)
         if not me or not battle or not my_moves:
             return (0.0, None, 0, "no-moves")
-        live_opps = [o for o in opps if o and not o.fainted]
         if not live_opps:
             return (0.0, None, 0, "no-opps")
 
         candidates: List[Tuple[float, object, int, str]] = []
         # Spread
         for m in my_moves:
-            if self._is_spread(m):
-                s = self._move_score_spread(m, me, opps, mem, ally=ally)
+            if self._prep(m).spread:
+                s = self._move_score_spread(m, me, live_opps, mem, ally=ally)
                 if s > 0:
                     candidates.append((s, m, 0, "spread"))
         # Single-target
-        tmap = [(live_opps[0], 1)] + ([(live_opps[1], 2)] if len(live_opps) > 1 else [])
         for m in my_moves:
-            if not self._is_spread(m):
+            if not self._prep(m).spread:
                 for tgt, ps in tmap:
                     s = self._move_score_vs_single(m, me, tgt, mem)
                     if prefer_slot and ps == prefer_slot:
@@ -337,85 +534,85 @@ class VGCHeuristicsRandom(Player):
                         candidates.append((s, m, ps, "single"))
         if not candidates:
             return (0.0, None, 0, "no-cands")
-        candidates.sort(key=lambda x: x[0], reverse=True)
-        best = candidates[0]
-        try:
-            top3 = [(getattr(m, 'id', '?'), round(s,1), ('t'+str(ps) if ps else 'auto'), why) for s,m,ps,why in candidates[:3]]
-            dbg(f"T{getattr(battle,'turn',1)} slot={slot} me={getattr(me,'species','?')} hp={getattr(me,'current_hp_fraction',1):.2f}")
-            dbg("  top:", top3)
-        except Exception:
-            pass
+        best = max(candidates, key=lambda x: x[0])
+        if DEBUG_DECISIONS:
+            try:
+                top3 = [(getattr(m, 'id', '?'), round(s,1), ('t'+str(ps) if ps else 'auto'), why)
+                        for s,m,ps,why in heapq.nlargest(3, candidates, key=lambda x: x[0])]
+                dbg(f"T{getattr(battle,'turn',1)} slot={slot} me={getattr(me,'species','?')} hp={getattr(me,'current_hp_fraction',1):.2f}")
+                dbg("  top:", top3)
+            except Exception:
+                pass
         return best
 
+    def _order_for_slot(self, battle, slot: int, me, ally, live_opps, tmap, mem: Dict[str, bool],
+                        prefer_slot: Optional[int]=None) -> Tuple[Optional[BattleOrder], int]:
+        """(orden, target_index_ps) para `slot`; (None, 0) si no hay nada mejor que random."""
+        s, mv, tgt, why = self._best_move_and_target(battle, me, live_opps, tmap, mem, ally=ally, prefer_slot=prefer_slot)
+        if mv:
+            if self._prep(mv).needs_target and tgt in (1, 2):
+                if DEBUG_DECISIONS:
+                    dbg(f"T{battle.turn} slot={slot} -> MOVE {getattr(mv,'id','?')} tgt={tgt} [{why}]")
+                return self.create_order(mv, move_target=tgt), tgt
+            if DEBUG_DECISIONS:
+                dbg(f"T{battle.turn} slot={slot} -> MOVE {getattr(mv,'id','?')} (no target) [{why}]")
+            return self.create_order(mv), 0
+        slot_moves = self._moves_for_slot(battle, slot)
+        # Un solo pase: el ataque de más potencia, prefiriendo single-target sobre spread
+        mv = max((m for m in slot_moves if self._prep(m).bp > 0),
+                 key=lambda m: (not self._prep(m).spread, self._prep(m).bp), default=None)
+        if mv:
+            if DEBUG_DECISIONS:
+                dbg(f"T{battle.turn} slot={slot} -> SIMPLE ATTACK (fallback)")
+            return self.create_order(mv), 0
+        if DEBUG_DECISIONS:
+            dbg(f"T{battle.turn} slot={slot} -> RANDOM (no better option)")
+        return None, 0
+
     # ---------- decisión de movimientos por turno ----------
     def choose_move(self, battle):
         try:
+            # Cachés por turno: los ids de objetos no son estables entre turnos
+            self._move_info.clear()
+            self._eff_cache.clear()
+            self._mon_state.clear()
             mem = self._get_series_mem(battle)
             self._prefer_target_slot = None
 
-            me_list: List = [p for p in (getattr(battle, "active_pokemon", []) or []) if p]
-            opp_list: List = [p for p in (getattr(battle, "opponent_active_pokemon", []) or []) if p]
+            # Caso habitual: ambos slots ocupados → se usa la secuencia tal cual
+            ap = getattr(battle, "active_pokemon", None) or ()
+            me_list = ap if all(ap) else tuple(p for p in ap if p)
+            oap = getattr(battle, "opponent_active_pokemon", None) or ()
+            opp_list = oap if all(oap) else tuple(p for p in oap if p)
             if len(me_list) == 0:
                 return self.choose_random_doubles_move(battle)
 
+            live_opps = [o for o in opp_list if not o.fainted]
+            tmap = [(o, ps) for ps, o in enumerate(live_opps[:2], start=1)]
+
             orders: List[Optional[BattleOrder]] = [None, None]
 
-            # Slot 0
-            if len(me_list) > 0:
-                me0 = me_list[0]
-                ally1 = me_list[1] if len(me_list) > 1 else None
-                s0, mv0, tgt0, why0 = self._best_move_and_target(battle, me0, opp_list, mem, ally=ally1)
-                if mv0:
-                    if self._requires_explicit_target(mv0) and tgt0 in (1, 2):
-                        orders[0] = self.create_order(mv0, move_target=tgt0)
-                        self._prefer_target_slot = tgt0
-                        dbg(f"T{battle.turn} slot=0 -> MOVE {getattr(mv0,'id','?')} tgt={tgt0} [{why0}]")
-                    else:
-                        orders[0] = self.create_order(mv0)
-                        dbg(f"T{battle.turn} slot=0 -> MOVE {getattr(mv0,'id','?')} (no target) [{why0}]")
-                else:
-                    slot_moves0 = self._moves_for_slot(battle, 0)
-                    mv = next((m for m in slot_moves0 if (m.base_power or 0) > 0 and not self._is_spread(m)), None)
-                    if not mv:
-                        mv = next((m for m in slot_moves0 if (m.base_power or 0) > 0), None)
-                    if mv:
-                        orders[0] = self.create_order(mv)
-                        dbg(f"T{battle.turn} slot=0 -> SIMPLE ATTACK (fallback)")
-                    else:
-                        dbg(f"T{battle.turn} slot=0 -> RANDOM (no better option)")
-                        return self.choose_random_doubles_move(battle)
-
-            # Slot 1
-            if len(me_list) > 1:
-                me1 = me_list[1]
-                ally0 = me_list[0]
-                s1, mv1, tgt1, why1 = self._best_move_and_target(battle, me1, opp_list, mem, ally=ally0, prefer_slot=self._prefer_target_slot)
-                if mv1:
-                    if self._requires_explicit_target(mv1) and tgt1 in (1, 2):
-                        orders[1] = self.create_order(mv1, move_target=tgt1)
-                        dbg(f"T{battle.turn} slot=1 -> MOVE {getattr(mv1,'id','?')} tgt={tgt1} [{why1}]")
-                    else:
-                        orders[1] = self.create_order(mv1)
-                        dbg(f"T{battle.turn} slot=1 -> MOVE {getattr(mv1,'id','?')} (no target) [{why1}]")
-                else:
-                    slot_moves1 = self._moves_for_slot(battle, 1)
-                    mv = next((m for m in slot_moves1 if (m.base_power or 0) > 0 and not self._is_spread(m)), None)
-                    if not mv:
-                        mv = next((m for m in slot_moves1 if (m.base_power or 0) > 0), None)
-                    if mv:
-                        orders[1] = self.create_order(mv)
-                        dbg(f"T{battle.turn} slot=1 -> SIMPLE ATTACK (fallback)")
-                    else:
-                        dbg(f"T{battle.turn} slot=1 -> RANDOM (no better option)")
-                        return self.choose_random_doubles_move(battle)
+            # Ambos slots comparten las cachés del turno (MoveInfo, eficacias, MonState)
+            for slot in range(min(2, len(me_list))):
+                me = me_list[slot]
+                ally = me_list[1 - slot] if len(me_list) > 1 else None
+                order, tgt = self._order_for_slot(battle, slot, me, ally, live_opps, tmap, mem,
+                                                  prefer_slot=self._prefer_target_slot)
+                if order is None:
+                    return self.choose_random_doubles_move(battle)
+                orders[slot] = order
+                if slot == 0 and tgt:
+                    self._prefer_target_slot = tgt  # doble focus
 
             # Asegura dos órdenes
             for i in range(2):
                 if orders[i] is None:
-                    dbg(f"T{battle.turn} WARN: missing order for slot {i}, using random")
+                    if DEBUG_DECISIONS:
+                        dbg(f"T{battle.turn} WARN: missing order for slot {i}, using random")
                     return self.choose_random_doubles_move(battle)
 
-            dbg(f"T{battle.turn} -> DoubleOrder ready")
+            if DEBUG_DECISIONS:
+                dbg(f"T{battle.turn} -> DoubleOrder ready")
             return DoubleBattleOrder(orders[0], orders[1])
 
         except Exception as e:
@@ -426,7 +623,8 @@ class VGCHeuristicsRandom(Player):
     # ---------- hooks ----------
     def _battle_finished_callback(self, battle):
         try:
-            self._update_series_mem_from_battle(battle)
+            if self._update_series_mem_from_battle(battle):
+                self._save_series_memory()
             dbg("Battle finished.")
         except Exception:
             pass